@@ -1,3 +1,6 @@
+import io
+import os
+
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -14,40 +17,178 @@ INTAKE_PATH = "data/intake_responses.csv"
 WEEKLY_PATH = "data/weekly_responses.csv"
 CONFIG_PATH = "data/config.csv"
 
+# Rows rendered per table on the Data tab; the full frame is offered as a download
+PREVIEW_ROWS = 200
 
-def plot_line(x, y, xlabel, ylabel, title):
+
+# Charts are rendered to PNG once per distinct input and cached, so reruns skip
+# both figure construction and the savefig that st.pyplot does on every call.
+def fig_to_png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight", dpi=200)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+# ~60 KB per PNG and 9 charts per member viewed: bound the caches so a
+# long-running server evicts old charts instead of growing without limit.
+CHART_CACHE_ENTRIES = 270
+
+
+@st.cache_data(show_spinner=False, max_entries=CHART_CACHE_ENTRIES)
+def line_png(x, y, xlabel, ylabel, title):
     fig, ax = plt.subplots()
     ax.plot(x, y, marker="o")
     ax.set_xlabel(xlabel)
     ax.set_ylabel(ylabel)
     ax.set_title(title)
     ax.grid(True, alpha=0.3)
-    st.pyplot(fig)
+    return fig_to_png(fig)
 
 
-def plot_hist(series, xlabel, title):
+@st.cache_data(show_spinner=False, max_entries=CHART_CACHE_ENTRIES)
+def hist_png(values, xlabel, title):
     fig, ax = plt.subplots()
-    ax.hist(series.dropna(), bins=10)
+    ax.hist(values, bins=10)
     ax.set_xlabel(xlabel)
     ax.set_ylabel("Count")
     ax.set_title(title)
     ax.grid(True, alpha=0.3)
-    st.pyplot(fig)
+    return fig_to_png(fig)
+
+
+def plot_line(x, y, xlabel, ylabel, title):
+    x = pd.Series(x).to_numpy(dtype=float, na_value=np.nan)
+    y = pd.Series(y).to_numpy(dtype=float, na_value=np.nan)
+    st.image(line_png(x, y, xlabel, ylabel, title), width="stretch")
+
+
+def plot_hist(series, xlabel, title):
+    values = series.dropna().to_numpy(dtype=float)
+    st.image(hist_png(values, xlabel, title), width="stretch")
+
+
+# -----------------
+# Cached loaders
+# -----------------
+# Streamlit reruns this script on every widget interaction. Everything derived
+# from the CSVs is cached and keyed on file mtimes so it only rebuilds when the
+# data on disk changes.
+def file_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+@st.cache_data(show_spinner=False)
+def load_config_cached(path, mtime):
+    return be.load_config(path)
+
+
+@st.cache_data(show_spinner=False)
+def load_intake(path, mtime):
+    return be.normalize_common(be.read_csv(path))
+
+
+@st.cache_data(show_spinner=False)
+def load_weekly(path, mtime):
+    return be.normalize_common(be.read_csv(path))
+
+
+@st.cache_data(show_spinner=False)
+def load_pipeline(intake_path, weekly_path, intake_mtime, weekly_mtime):
+    """
+    Returns: (merged_df, weekly_clean, duplicates_df)
+    Inputs are assumed to have passed validation already.
+    """
+    intake_df = load_intake(intake_path, intake_mtime)
+    weekly_df = load_weekly(weekly_path, weekly_mtime)
+    weekly_df["week_number"] = be.parse_week_number(weekly_df["week_number"])
+    weekly_df, duplicates_df = be.dedupe_weekly_keep_latest(weekly_df)
+    merged_df, weekly_clean = be.prep_data(intake_df, weekly_df)
+    return merged_df, weekly_clean, duplicates_df
+
+
+# Leading underscore: Streamlit skips hashing the frame; data_version
+# (the source file mtimes) stands in as its fingerprint. One entry per member
+# viewed, so keep it bounded.
+@st.cache_data(show_spinner=False, max_entries=100)
+def cohort_summary(_merged_df, data_version, member_email=None):
+    """
+    Full-cohort summary by default; with member_email, only that member's rows
+    are aggregated. Each variant is computed once per data version.
+    """
+    if member_email is None:
+        return be.cohort_weekly_summary(_merged_df)
+    return be.cohort_weekly_summary(_merged_df[_merged_df["email"] == member_email])
+
+
+# cache_resource hands back the same object instead of a copy, so lookups on
+# the indexed frame don't pay for a full deserialize each rerun. Read-only.
+@st.cache_resource(show_spinner=False, max_entries=1)
+def merged_by_member(_merged_df, data_version):
+    return be.index_by_member(_merged_df)
+
+
+@st.cache_data(show_spinner=False)
+def member_options(_merged_df, data_version):
+    return ["(All members)"] + sorted(_merged_df["email"].dropna().unique().tolist())
+
+
+@st.cache_data(show_spinner=False)
+def action_list(_intake_df, _merged_df, data_version):
+    return be.coaching_action_list(_intake_df, _merged_df)
+
+
+@st.cache_data(show_spinner=False)
+def preview_rows(_df, data_version, name):
+    return _df.head(PREVIEW_ROWS)
+
+
+@st.cache_data(show_spinner=False)
+def csv_bytes(_df, data_version, name):
+    return _df.to_csv(index=False).encode("utf-8")
+
+
+def data_preview(label, df, name):
+    """
+    Render a table only while its toggle is on (state kept in st.session_state),
+    so collapsed previews don't serialize whole frames to the browser every rerun.
+    A collapsed st.expander still runs its body, and its on_change hook only
+    exists from Streamlit 1.55, above this app's 1.49 minimum.
+    """
+    if not st.toggle(label, key=f"preview_{name}"):
+        return
+    if len(df) > PREVIEW_ROWS:
+        st.caption(f"Showing first {PREVIEW_ROWS} of {len(df)} rows.")
+    st.dataframe(preview_rows(df, data_version, name), width="stretch")
+    st.download_button(
+        "Download full CSV",
+        data=csv_bytes(df, data_version, name),
+        file_name=f"{name}.csv",
+        mime="text/csv",
+        key=f"download_{name}",
+    )
 
 
 # -----------------
 # Load data
 # -----------------
-cfg = be.load_config(CONFIG_PATH)
+intake_mtime = file_mtime(INTAKE_PATH)
+weekly_mtime = file_mtime(WEEKLY_PATH)
+data_version = (intake_mtime, weekly_mtime)
+
+cfg = load_config_cached(CONFIG_PATH, file_mtime(CONFIG_PATH))
 
 try:
-    intake_df = pd.read_csv(INTAKE_PATH)
+    intake_df = load_intake(INTAKE_PATH, intake_mtime)
 except Exception as e:
     st.error(f"Could not load intake CSV at '{INTAKE_PATH}': {e}")
     st.stop()
 
 try:
-    weekly_df = pd.read_csv(WEEKLY_PATH)
+    weekly_df = load_weekly(WEEKLY_PATH, weekly_mtime)
     weekly_available = True
 except FileNotFoundError:
     weekly_available = False
@@ -57,8 +198,7 @@ except Exception as e:
     weekly_available = False
     weekly_df = pd.DataFrame()
 
-# Normalize & validate intake
-intake_df = be.normalize_common(intake_df)
+# Validate intake
 missing_intake = be.validate_intake(intake_df)
 if missing_intake:
     st.error(f"Intake CSV missing required columns: {missing_intake}")
@@ -70,16 +210,12 @@ merged_df = pd.DataFrame()
 weekly_clean = pd.DataFrame()
 
 if weekly_available and not weekly_df.empty:
-    weekly_df = be.normalize_common(weekly_df)
-
     missing_weekly = be.validate_weekly(weekly_df)
     if missing_weekly:
         st.error(f"Weekly CSV missing required columns: {missing_weekly}")
         st.stop()
 
-    weekly_df["week_number"] = be.parse_week_number(weekly_df["week_number"])
-    weekly_df, duplicates_df = be.dedupe_weekly_keep_latest(weekly_df)
-    merged_df, weekly_clean = be.prep_data(intake_df, weekly_df)
+    merged_df, weekly_clean, duplicates_df = load_pipeline(INTAKE_PATH, WEEKLY_PATH, intake_mtime, weekly_mtime)
 
 # -----------------
 # Header + KPIs
@@ -103,18 +239,20 @@ st.divider()
 # -----------------
 member_email = None
 if not merged_df.empty and "email" in merged_df.columns:
-    all_members = sorted(merged_df["email"].dropna().unique().tolist())
-    member_email = st.selectbox("Select a member to review", options=["(All members)"] + all_members)
+    member_email = st.selectbox("Select a member to review", options=member_options(merged_df, data_version))
 else:
     st.info("No weekly data loaded yet — member selection will appear once check-ins start.")
 
 # -----------------
 # Tabs
 # -----------------
+# Each tab body is a fragment: widgets inside a tab (e.g. the Data previews)
+# rerun only that tab instead of the whole script.
 tab1, tab2, tab3, tab4 = st.tabs(["Trends Over Time", "Before/After", "Coaching Action List", "Data"])
 
 # --- Trends Over Time ---
-with tab1:
+@st.fragment
+def trends_tab(merged_df, member_email):
     st.subheader("Gym trends over time")
 
     if merged_df.empty:
@@ -122,14 +260,12 @@ with tab1:
     else:
         # Filter for member if selected
         if member_email and member_email != "(All members)":
-            view_df = merged_df[merged_df["email"] == member_email].copy()
+            summary = cohort_summary(merged_df, data_version, member_email)
             st.caption(f"Showing trends for: {member_email}")
         else:
-            view_df = merged_df.copy()
+            summary = cohort_summary(merged_df, data_version)
             st.caption("Showing trends for: All members")
 
-        summary = be.cohort_weekly_summary(view_df)
-
         colA, colB, colC = st.columns(3)
         with colA:
             if not summary.empty and "bodyweight_mean" in summary.columns:
@@ -167,7 +303,7 @@ with tab1:
         # Member detail: show their most recent row + key deltas
         if member_email and member_email != "(All members)":
             st.subheader("Member snapshot (latest check-in)")
-            snap = be.member_latest_snapshot(merged_df, member_email)
+            snap = be.member_latest_snapshot_indexed(merged_by_member(merged_df, data_version), member_email)
             if snap.empty:
                 st.info("No check-ins found for this member.")
             else:
@@ -183,16 +319,21 @@ with tab1:
                 show_cols = [c for c in show_cols if c in snap.columns]
                 st.dataframe(snap[show_cols], use_container_width=True)
 
+
+with tab1:
+    trends_tab(merged_df, member_email)
+
 # --- Before/After ---
-with tab2:
+@st.fragment
+def before_after_tab(merged_df, member_email):
     st.subheader("Before vs After (baseline → final week)")
 
     if merged_df.empty or "week_number" not in merged_df.columns:
         st.info("No weekly data yet.")
     else:
-        df = merged_df.copy()
+        df = merged_df
         if member_email and member_email != "(All members)":
-            df = df[df["email"] == member_email].copy()
+            df = df[df["email"] == member_email]
             st.caption(f"Comparing for: {member_email}")
         else:
             st.caption("Comparing for: All members")
@@ -204,7 +345,7 @@ with tab2:
             final_week = int(weeks.max())
             st.caption(f"Final week detected: Week {final_week}")
 
-            final_rows = df[df["week_number"] == final_week].copy()
+            final_rows = df[df["week_number"] == final_week]
 
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -223,8 +364,13 @@ with tab2:
                 else:
                     st.info("Energy delta unavailable.")
 
+
+with tab2:
+    before_after_tab(merged_df, member_email)
+
 # --- Coaching Action List ---
-with tab3:
+@st.fragment
+def action_list_tab(intake_df, merged_df):
     st.subheader("Coaching action list (latest week)")
 
     if merged_df.empty:
@@ -236,7 +382,7 @@ with tab3:
         else:
             st.caption(f"Current week: Week {wk}")
 
-            missing_df, at_risk_df = be.coaching_action_list(intake_df, merged_df)
+            missing_df, at_risk_df = action_list(intake_df, merged_df, data_version)
 
             st.markdown("### Missing weekly check-in")
             if not missing_df.empty:
@@ -259,20 +405,23 @@ with tab3:
             else:
                 st.success("No at-risk flags triggered this week (based on current rules).")
 
+
+with tab3:
+    action_list_tab(intake_df, merged_df)
+
 # --- Data ---
-with tab4:
+@st.fragment
+def data_tab(merged_df, intake_df, weekly_clean, duplicates_df):
     st.subheader("Data preview (debug)")
-    with st.expander("Merged (weekly + intake)", expanded=False):
-        st.dataframe(merged_df, use_container_width=True)
+    data_preview("Merged (weekly + intake)", merged_df, "merged")
+    data_preview("Intake responses", intake_df, "intake")
+    data_preview("Weekly responses (deduped)", weekly_clean, "weekly_clean")
 
-    with st.expander("Intake responses", expanded=False):
-        st.dataframe(intake_df, use_container_width=True)
+    if isinstance(duplicates_df, pd.DataFrame) and len(duplicates_df):
+        data_preview("Duplicates detected (informational)", duplicates_df, "duplicates")
 
-    with st.expander("Weekly responses (deduped)", expanded=False):
-        st.dataframe(weekly_clean, use_container_width=True)
 
-    if isinstance(duplicates_df, pd.DataFrame) and len(duplicates_df):
-        with st.expander("Duplicates detected (informational)", expanded=False):
-            st.dataframe(duplicates_df, use_container_width=True)
+with tab4:
+    data_tab(merged_df, intake_df, weekly_clean, duplicates_df)
 
 st.caption("v3: Coach-only dashboard (no sidebar, split frontend/backend). Next: live Google Sheets + exports.")
@@ -1,4 +1,8 @@
+import re
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 
 ADHERENCE_MAP = {
@@ -24,28 +28,71 @@ REQUIRED_INTAKE = {
 
 REQUIRED_WEEKLY_MIN = {"timestamp", "email", "week_number"}
 
+WEEK_DIGITS = re.compile(r"\d+")
+
+# (weekly column, baseline column, delta column)
+DELTA_PAIRS = [
+    ("bodyweight_lbs_weekly", "bodyweight_lbs_baseline", "delta_bodyweight_lbs"),
+    ("rhr_bpm_weekly", "rhr_bpm_baseline", "delta_rhr_bpm"),
+    ("energy_weekly", "energy_baseline", "delta_energy"),
+]
+
+
+def as_arrow(values, index=None, name=None) -> pd.Series:
+    """
+    Wrap values (Series/array, NaN or NaT as missing) as an arrow-backed Series.
+    Goes through pa.array: on pandas 3.0.x astype(ArrowDtype) and
+    convert_dtypes overwrite NaT in the source column with the epoch.
+    """
+    return pd.Series(pd.arrays.ArrowExtensionArray(pa.array(values, from_pandas=True)), index=index, name=name)
+
 
 def normalize_common(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    # assign() only materializes the replaced columns instead of copying the whole frame
+    updates = {}
     if "email" in df.columns:
-        df["email"] = df["email"].astype(str).str.strip().str.lower()
+        # Arrow-backed strings: strip/lower run as Arrow compute kernels
+        updates["email"] = df["email"].astype("string[pyarrow]").str.strip().str.lower()
     if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    return df
+        updates["timestamp"] = as_arrow(pd.to_datetime(df["timestamp"], errors="coerce"), index=df.index)
+    return df.assign(**updates)
 
 
 def parse_week_number(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip()
-    s = s.str.replace("Week", "", regex=False).str.strip()
-    return pd.to_numeric(s, errors="coerce").astype("Int64")
+    # Only a handful of distinct labels ("Week 3", "week3", "3", ...): parse
+    # the uniques once and broadcast back through the factorize codes.
+    codes, labels = pd.factorize(series)
+    matches = (WEEK_DIGITS.search(str(label)) for label in labels)
+    week_values = pd.array([int(m.group()) if m else None for m in matches], dtype="int64[pyarrow]")
+    week_values = pd.to_numeric(week_values, downcast="integer")
+    return pd.Series(week_values.take(codes, allow_fill=True), index=series.index, name=series.name)
+
+
+def map_bins(series: pd.Series, mapping: dict) -> pd.Series:
+    """
+    Same result as series.map(mapping), via label codes into a lookup array.
+    Unmatched labels get code -1, which hits the trailing NaN.
+    """
+    codes = pd.Index(list(mapping)).get_indexer(series)
+    lookup = np.append(np.fromiter(mapping.values(), dtype=float), np.nan)
+    return as_arrow(lookup[codes], index=series.index, name=series.name)
+
+
+def cast_numeric(df: pd.DataFrame, cols: list[str], downcast: bool = False) -> pd.DataFrame:
+    # downcast=True is for whole-number fields (Likert scores, counts): they get
+    # the smallest int type that fits. pandas leaves fractional values untouched.
+    # Measured values (bodyweight, RHR) keep full precision so exports stay exact.
+    updates = {
+        c: pd.to_numeric(df[c], errors="coerce", downcast="integer" if downcast else None)
+        for c in cols if c in df.columns
+    }
+    return df.assign(**updates)
 
 
-def cast_numeric(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
-    df = df.copy()
-    for c in cols:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    return df
+def read_csv(path: str) -> pd.DataFrame:
+    # pyarrow ships with streamlit; its parser is multithreaded and keeps
+    # columns arrow-backed so string ops stay in Arrow compute kernels.
+    return pd.read_csv(path, engine="pyarrow", dtype_backend="pyarrow")
 
 
 def load_config(path: str) -> dict:
@@ -55,7 +102,7 @@ def load_config(path: str) -> dict:
     """
     cfg = {"challenge_name": "Nutrition Challenge"}
     try:
-        df = pd.read_csv(path)
+        df = read_csv(path)
         if len(df) >= 1:
             row = df.iloc[0].to_dict()
             name = str(row.get("challenge_name", "")).strip()
@@ -79,98 +126,141 @@ def dedupe_weekly_keep_latest(weekly: pd.DataFrame) -> tuple[pd.DataFrame, pd.Da
     if not {"email", "week_number"}.issubset(weekly.columns):
         return weekly, pd.DataFrame()
 
-    wk = weekly.copy()
-    wk = wk.sort_values("timestamp") if "timestamp" in wk.columns else wk.sort_index()
-
-    dup_mask = wk.duplicated(subset=["email", "week_number"], keep=False)
-    dup_cols = [c for c in ["email", "week_number", "timestamp"] if c in wk.columns]
-    duplicates = wk.loc[dup_mask, dup_cols].sort_values(
-        ["email", "week_number"] + (["timestamp"] if "timestamp" in wk.columns else [])
+    keys = ["email", "week_number"]
+    n = len(weekly)
+    if "timestamp" in weekly.columns:
+        # int64 epoch view of the timestamps, timezone-independent. NaT maps to
+        # the int64 minimum, so it counts as oldest. No sort needed.
+        order = weekly["timestamp"].to_numpy(dtype="int64", na_value=np.iinfo(np.int64).min)
+    else:
+        order = np.zeros(n, dtype="int64")
+
+    # idxmax keeps the first max per group; scanning the rows in reverse makes
+    # ties (and missing timestamps) resolve to the later row in the file.
+    # Positional (RangeIndex) series so the result is safe to .iloc with.
+    grp = pd.Series(order[::-1]).groupby(
+        [pd.Series(weekly[k].array[::-1]) for k in keys], sort=False, dropna=False
     )
-
-    wk = wk.drop_duplicates(subset=["email", "week_number"], keep="last")
+    latest_pos = np.sort(n - 1 - grp.idxmax().to_numpy())  # file order; int sort only
+    wk = weekly.iloc[latest_pos]
+
+    # Duplicates table: every row of a repeated key, grouped by key and oldest
+    # first. Ordered with an integer lexsort on group id + timestamp rather
+    # than a string sort on email.
+    dup_rows = np.flatnonzero((grp.transform("size") > 1).to_numpy()[::-1])
+    group_ids = grp.ngroup().to_numpy()[::-1]
+    dup_rows = dup_rows[np.lexsort((order[dup_rows], group_ids[dup_rows]))]
+    dup_cols = [c for c in ["email", "week_number", "timestamp"] if c in weekly.columns]
+    duplicates = weekly.iloc[dup_rows][dup_cols]
     return wk, duplicates
 
 
 def validate_intake(intake: pd.DataFrame) -> list[str]:
-    missing = sorted(list(REQUIRED_INTAKE - set(intake.columns)))
+    # `in` on a pandas Index is a hash lookup; no set over all columns needed
+    missing = [c for c in REQUIRED_INTAKE if c not in intake.columns]
+    missing.sort()
     return missing
 
 
 def validate_weekly(weekly: pd.DataFrame) -> list[str]:
-    missing = sorted(list(REQUIRED_WEEKLY_MIN - set(weekly.columns)))
+    missing = [c for c in REQUIRED_WEEKLY_MIN if c not in weekly.columns]
+    missing.sort()
     return missing
 
 
 def prep_data(intake: pd.DataFrame, weekly: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
+    Expects both frames already passed through normalize_common, and weekly
+    through parse_week_number + dedupe_weekly_keep_latest (as app.py does).
     Returns:
       merged_df: weekly rows left-joined to intake by email
       weekly_clean: cleaned/deduped weekly
     """
-    intake = normalize_common(intake)
-    weekly = normalize_common(weekly)
-
-    weekly["week_number"] = parse_week_number(weekly["week_number"])
-
     # Map categorical bins -> numeric where relevant
+    weekly_bins = {}
     if "nutrition_adherence_weekly" in weekly.columns:
-        weekly["adherence_score_weekly"] = weekly["nutrition_adherence_weekly"].map(ADHERENCE_MAP)
+        weekly_bins["adherence_score_weekly"] = map_bins(weekly["nutrition_adherence_weekly"], ADHERENCE_MAP)
 
     if "sleep_hours_weekly" in weekly.columns:
-        weekly["sleep_hours_numeric_weekly"] = weekly["sleep_hours_weekly"].map(SLEEP_BIN_MAP)
+        weekly_bins["sleep_hours_numeric_weekly"] = map_bins(weekly["sleep_hours_weekly"], SLEEP_BIN_MAP)
+    weekly = weekly.assign(**weekly_bins)
 
     if "sleep_hours_baseline" in intake.columns:
-        intake["sleep_hours_numeric_baseline"] = intake["sleep_hours_baseline"].map(SLEEP_BIN_MAP)
+        intake = intake.assign(sleep_hours_numeric_baseline=map_bins(intake["sleep_hours_baseline"], SLEEP_BIN_MAP))
 
     # Numeric casts
+    intake = cast_numeric(intake, ["bodyweight_lbs_baseline", "rhr_bpm_baseline"])
     intake = cast_numeric(intake, [
-        "bodyweight_lbs_baseline", "rhr_bpm_baseline",
         "sleep_quality_baseline", "energy_baseline",
         "stress_baseline", "classes_per_week_baseline",
         "whole_food_days_per_week_baseline", "alcohol_days_per_week_baseline",
         "takeout_per_week_baseline"
-    ])
+    ], downcast=True)
 
+    weekly = cast_numeric(weekly, ["bodyweight_lbs_weekly", "rhr_bpm_weekly"])
     weekly = cast_numeric(weekly, [
-        "bodyweight_lbs_weekly", "rhr_bpm_weekly",
         "energy_weekly", "sleep_quality_weekly",
         "stress_weekly", "alcohol_days_weekly",
         "class_attended_weekly"
-    ])
+    ], downcast=True)
 
     merged = weekly.merge(intake, on="email", how="left", suffixes=("", "_intake"))
 
-    # Deltas vs intake baseline
-    if {"bodyweight_lbs_weekly", "bodyweight_lbs_baseline"}.issubset(merged.columns):
-        merged["delta_bodyweight_lbs"] = merged["bodyweight_lbs_weekly"] - merged["bodyweight_lbs_baseline"]
-    if {"rhr_bpm_weekly", "rhr_bpm_baseline"}.issubset(merged.columns):
-        merged["delta_rhr_bpm"] = merged["rhr_bpm_weekly"] - merged["rhr_bpm_baseline"]
-    if {"energy_weekly", "energy_baseline"}.issubset(merged.columns):
-        merged["delta_energy"] = merged["energy_weekly"] - merged["energy_baseline"]
+    # Deltas vs intake baseline, as one (N, k) subtraction
+    pairs = [(wk, bl, out) for wk, bl, out in DELTA_PAIRS if wk in merged.columns and bl in merged.columns]
+    if pairs:
+        weekly_vals = merged[[wk for wk, _, _ in pairs]].to_numpy(dtype=float, na_value=np.nan)
+        baseline_vals = merged[[bl for _, bl, _ in pairs]].to_numpy(dtype=float, na_value=np.nan)
+        deltas = weekly_vals - baseline_vals
+        merged = merged.assign(**{out: as_arrow(deltas[:, i], index=merged.index) for i, (_, _, out) in enumerate(pairs)})
 
     return merged, weekly
 
 
+# Output column -> source column for cohort_weekly_summary
+SUMMARY_MEANS = {
+    "bodyweight_mean": "bodyweight_lbs_weekly",
+    "rhr_mean": "rhr_bpm_weekly",
+    "energy_mean": "energy_weekly",
+    "adherence_mean": "adherence_score_weekly",
+    "sleep_hours_mean": "sleep_hours_numeric_weekly",
+    "stress_mean": "stress_weekly",
+}
+
+
+def grouped_mean(codes: np.ndarray, values: pd.Series, n_groups: int) -> np.ndarray:
+    """
+    NaN-skipping mean per group code in a single bincount pass.
+    """
+    vals = values.to_numpy(dtype=float, na_value=np.nan)
+    valid = ~np.isnan(vals)
+    # Zero-fill NaNs rather than masking, so no compacted copies of codes/values
+    sums = np.bincount(codes, weights=np.where(valid, vals, 0.0), minlength=n_groups)
+    counts = np.bincount(codes, weights=valid, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
 def cohort_weekly_summary(merged: pd.DataFrame) -> pd.DataFrame:
     if merged is None or merged.empty or "week_number" not in merged.columns:
-        return pd.DataFrame(columns=[
-            "week_number", "n_participants",
-            "bodyweight_mean", "rhr_mean", "energy_mean",
-            "adherence_mean", "sleep_hours_mean", "stress_mean"
-        ])
-
-    g = merged.dropna(subset=["week_number"]).groupby("week_number")
-    out = g.agg(
-        n_participants=("email", "nunique"),
-        bodyweight_mean=("bodyweight_lbs_weekly", "mean"),
-        rhr_mean=("rhr_bpm_weekly", "mean"),
-        energy_mean=("energy_weekly", "mean"),
-        adherence_mean=("adherence_score_weekly", "mean"),
-        sleep_hours_mean=("sleep_hours_numeric_weekly", "mean"),
-        stress_mean=("stress_weekly", "mean"),
-    ).reset_index().sort_values("week_number")
-    return out
+        return pd.DataFrame(columns=["week_number", "n_participants", *SUMMARY_MEANS])
+
+    m = merged.dropna(subset=["week_number"])
+    week_codes, weeks = pd.factorize(m["week_number"], sort=True)
+    n_weeks = len(weeks)
+
+    # Mark each (week, email) pair seen in a dense grid -> participants per week
+    email_codes, emails = pd.factorize(m["email"])
+    has_email = email_codes >= 0
+    seen = np.zeros((n_weeks, len(emails)), dtype=bool)
+    seen[week_codes[has_email], email_codes[has_email]] = True
+    n_participants = seen.sum(axis=1)
+
+    out = {"week_number": weeks, "n_participants": n_participants}
+    for out_col, src_col in SUMMARY_MEANS.items():
+        if src_col in m.columns:
+            out[out_col] = grouped_mean(week_codes, m[src_col], n_weeks)
+    return pd.DataFrame(out)
 
 
 def compute_total_weight_lost(merged: pd.DataFrame) -> float:
@@ -180,14 +270,15 @@ def compute_total_weight_lost(merged: pd.DataFrame) -> float:
     if not needed.issubset(merged.columns):
         return 0.0
 
-    latest_rows = (
-        merged.dropna(subset=["week_number"])
-        .sort_values("week_number")
-        .groupby("email", as_index=False)
-        .tail(1)
+    # Latest week per member without sorting the whole frame
+    m = merged.dropna(subset=["week_number"])
+    latest_idx = m.groupby("email", sort=False)["week_number"].idxmax()
+    latest_rows = m.loc[latest_idx]
+    weight_change = (
+        latest_rows["bodyweight_lbs_weekly"].to_numpy(dtype=float, na_value=np.nan)
+        - latest_rows["bodyweight_lbs_baseline"].to_numpy(dtype=float, na_value=np.nan)
     )
-    weight_change = latest_rows["bodyweight_lbs_weekly"] - latest_rows["bodyweight_lbs_baseline"]
-    return float(weight_change[weight_change < 0].abs().sum())
+    return float((-weight_change[weight_change < 0]).sum())
 
 
 def current_week(merged: pd.DataFrame) -> int | None:
@@ -209,25 +300,28 @@ def coaching_action_list(intake: pd.DataFrame, merged: pd.DataFrame) -> tuple[pd
     if wk is None:
         return pd.DataFrame(columns=["email"]), pd.DataFrame()
 
-    this_week = merged[merged["week_number"] == wk].copy()
-    submitted_emails = set(this_week["email"].dropna()) if "email" in this_week.columns else set()
-    all_emails = set(intake["email"].dropna()) if "email" in intake.columns else set()
+    this_week = merged[merged["week_number"] == wk]
+    submitted_emails = pd.Index(this_week["email"].dropna().unique() if "email" in this_week.columns else [])
+    all_emails = pd.Index(intake["email"].dropna().unique() if "email" in intake.columns else [])
 
-    missing = sorted(list(all_emails - submitted_emails))
+    missing = all_emails.difference(submitted_emails).sort_values()
     missing_df = pd.DataFrame({"email": missing})
 
-    # At-risk rules
-    at_risk = this_week.copy()
-    rule_adherence = pd.Series([False] * len(at_risk))
-    if "nutrition_adherence_weekly" in at_risk.columns:
-        rule_adherence = at_risk["nutrition_adherence_weekly"].astype(str).str.strip().eq("Very few days")
+    # At-risk rules (plain numpy masks; nulls never flag)
+    rule_adherence = np.zeros(len(this_week), dtype=bool)
+    if "nutrition_adherence_weekly" in this_week.columns:
+        rule_adherence = (
+            this_week["nutrition_adherence_weekly"].astype("string[pyarrow]").str.strip().eq("Very few days")
+            .to_numpy(dtype=bool, na_value=False)
+        )
 
-    rule_stress_sleep = pd.Series([False] * len(at_risk))
-    if {"stress_weekly", "sleep_quality_weekly"}.issubset(at_risk.columns):
-        rule_stress_sleep = (at_risk["stress_weekly"] >= 8) & (at_risk["sleep_quality_weekly"] <= 4)
+    rule_stress_sleep = np.zeros(len(this_week), dtype=bool)
+    if {"stress_weekly", "sleep_quality_weekly"}.issubset(this_week.columns):
+        stress = this_week["stress_weekly"].to_numpy(dtype=float, na_value=np.nan)
+        sleep_quality = this_week["sleep_quality_weekly"].to_numpy(dtype=float, na_value=np.nan)
+        rule_stress_sleep = (stress >= 8) & (sleep_quality <= 4)
 
-    at_risk["risk_flag"] = rule_adherence | rule_stress_sleep
-    at_risk = at_risk[at_risk["risk_flag"]].copy()
+    at_risk = this_week.loc[rule_adherence | rule_stress_sleep].assign(risk_flag=True)
 
     if "stress_weekly" in at_risk.columns:
         at_risk = at_risk.sort_values("stress_weekly", ascending=False)
@@ -242,8 +336,32 @@ def member_latest_snapshot(merged: pd.DataFrame, member_email: str) -> pd.DataFr
     if merged is None or merged.empty or "email" not in merged.columns:
         return pd.DataFrame()
 
-    df = merged[merged["email"] == member_email].copy()
+    df = merged[merged["email"] == member_email]
     df = df.dropna(subset=["week_number"]).sort_values("week_number")
     if df.empty:
         return pd.DataFrame()
     return df.tail(1)
+
+
+def index_by_member(merged: pd.DataFrame) -> pd.DataFrame:
+    """
+    merged keyed on a sorted (email, week_number) MultiIndex, for repeated
+    per-member lookups. Rows without a week number are dropped.
+    """
+    if merged is None or merged.empty or not {"email", "week_number"}.issubset(merged.columns):
+        return pd.DataFrame()
+    return merged.dropna(subset=["week_number"]).set_index(["email", "week_number"]).sort_index()
+
+
+def member_latest_snapshot_indexed(merged_indexed: pd.DataFrame, member_email: str) -> pd.DataFrame:
+    """
+    Same as member_latest_snapshot, but a sorted-index lookup on the frame
+    from index_by_member instead of a full-column scan.
+    """
+    if merged_indexed is None or merged_indexed.empty:
+        return pd.DataFrame()
+    try:
+        df = merged_indexed.loc[[member_email]]
+    except KeyError:
+        return pd.DataFrame()
+    return df.tail(1).reset_index()